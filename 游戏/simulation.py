@@ -0,0 +1,540 @@
+# 外汇交易模拟器的核心模型：货币、时钟、玩家、风险引擎、数据导出和市场推进，不依赖pygame
+import os
+import sys
+import json
+import math
+import queue
+import random
+import threading
+import time
+from array import array
+from collections import deque
+from statistics import NormalDist
+
+
+# 货币类
+class Currency:
+    def __init__(self, code, name, initial_rate, volatility):
+        self.code = code
+        self.name = name
+        self.rate = initial_rate  # 相对于基础货币（USD）的汇率
+        self.volatility = volatility
+        self.min_rate = initial_rate * 0.1  # 汇率下限，按初始汇率缩放（日元等低汇率货币不被钳到0.1）
+        self.history = [initial_rate]  # 每日收盘价
+        self.candles = []  # 每日K线 [(open, high, low, close), ...]
+        self.set_resolution(1)
+        self.start_day()
+
+    def set_resolution(self, ticks_per_day):
+        """按每日tick数缩放单tick波动，使日收益的均值和方差与原来按天推进时一致"""
+        self.tick_scale = 1 / math.sqrt(ticks_per_day)
+        # 趋势日原来的日收益为 ±0.7·|U(-v, v)|，即均值0.35v、幅度±0.35v的均匀分布
+        self.trend_scale = 0.35 / math.sqrt(ticks_per_day)
+        self.tick_drift = 0.35 * self.volatility / ticks_per_day
+
+    def start_day(self):
+        # 增加趋势性：如果最近趋势向上，当天更可能继续向上，反之亦然
+        self.trend = 0
+        if len(self.history) > 5:
+            self.trend = 1 if self.history[-1] - self.history[-6] > 0 else -1
+        self.open = self.high = self.low = self.rate
+
+    def tick(self):
+        # 随机波动，但有一定趋势性
+        change = random.uniform(-self.volatility, self.volatility)
+        if self.trend:
+            change = self.trend * (self.tick_drift + change * self.trend_scale)
+        else:
+            change *= self.tick_scale
+
+        self.rate = max(self.min_rate, self.rate * (1 + change))
+        # 增量维护当日K线
+        if self.rate > self.high:
+            self.high = self.rate
+        elif self.rate < self.low:
+            self.low = self.rate
+
+    def current_candle(self):
+        return self.open, self.high, self.low, self.rate
+
+    def close_day(self):
+        self.history.append(self.rate)
+        if len(self.history) > 100:
+            self.history.pop(0)
+        self.candles.append(self.current_candle())
+        if len(self.candles) > 100:
+            self.candles.pop(0)
+
+
+# 模拟时钟类：固定步长累加器，把真实时间按加速倍数换算成日内tick
+class SimClock:
+    def __init__(self, ticks_per_day=1440, speeds=(0, 1, 5, 30, 120, 720, 1440), max_steps_per_frame=1440):
+        self.ticks_per_day = ticks_per_day
+        self.speeds = speeds  # 每真实秒推进的tick数
+        self.speed_index = 0
+        self.paused_index = 1
+        self.max_steps_per_frame = max_steps_per_frame
+        self.tick = 0  # 当日已推进的tick数
+        self.accumulator = 0.0
+
+    @property
+    def speed(self):
+        return self.speeds[self.speed_index]
+
+    def faster(self):
+        self.speed_index = min(self.speed_index + 1, len(self.speeds) - 1)
+
+    def slower(self):
+        self.speed_index = max(self.speed_index - 1, 0)
+
+    def toggle_pause(self):
+        if self.speed_index:
+            self.paused_index, self.speed_index = self.speed_index, 0
+        else:
+            self.speed_index = self.paused_index
+
+    def advance(self, dt):
+        """累加真实时间dt（秒），返回本帧应推进的tick数"""
+        self.accumulator += dt * self.speed
+        steps = int(self.accumulator)
+        if steps > self.max_steps_per_frame:
+            # 追不上时丢弃积压，避免越卡越慢
+            steps = self.max_steps_per_frame
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps
+        return steps
+
+    def step(self):
+        """推进一个tick，返回当天是否结束"""
+        self.tick += 1
+        if self.tick >= self.ticks_per_day:
+            self.tick = 0
+            return True
+        return False
+
+    def ticks_left(self):
+        return self.ticks_per_day - self.tick
+
+    def time_label(self):
+        """当日模拟时刻 HH:MM，按 ticks_per_day 换算"""
+        minutes = self.tick * 1440 // self.ticks_per_day
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+    def speed_label(self):
+        """每真实秒推进的模拟时间，按 ticks_per_day 换算成分钟"""
+        if not self.speed:
+            return "暂停"
+        return f"{self.speed * 1440 / self.ticks_per_day:g}分钟/秒"
+
+
+# 玩家类
+class Player:
+    def __init__(self, risk_engine=None, initial_cash=10000.0):
+        self.initial_cash = initial_cash
+        self.cash = initial_cash  # 初始资金（USD）
+        self.portfolio = {}  # 持有的货币 {currency_code: amount}
+        self.total_value = self.cash
+        self.profit = 0.0
+        self.transactions = []
+        self.risk_engine = risk_engine
+        if risk_engine:
+            risk_engine.register(self)
+
+    def buy_currency(self, currency, amount, rate):
+        cost = amount * rate
+        if self.risk_engine:
+            ok, msg = self.risk_engine.check_order(self, currency.code, amount, rate)
+            if not ok:
+                return False, msg
+        elif cost > self.cash:
+            return False, "资金不足"
+
+        self.cash -= cost
+        if currency.code in self.portfolio:
+            self.portfolio[currency.code] += amount
+        else:
+            self.portfolio[currency.code] = amount
+        if self.risk_engine:
+            self.risk_engine.on_fill(self, currency.code, rate)
+
+        self.transactions.append(f"买入 {amount:.2f} {currency.code} @ {rate:.4f}")
+        return True, f"成功买入 {amount:.2f} {currency.code}"
+
+    def sell_currency(self, currency, amount, rate):
+        if currency.code not in self.portfolio or self.portfolio[currency.code] < amount:
+            return False, "持有量不足"
+
+        self.cash += amount * rate
+        self.portfolio[currency.code] -= amount
+
+        if self.portfolio[currency.code] < 0.01:  # 清理接近0的持仓
+            del self.portfolio[currency.code]
+        if self.risk_engine:
+            self.risk_engine.on_fill(self, currency.code, rate)
+
+        self.transactions.append(f"卖出 {amount:.2f} {currency.code} @ {rate:.4f}")
+        return True, f"成功卖出 {amount:.2f} {currency.code}"
+
+    def update_portfolio_value(self, currencies):
+        self.total_value = self.cash
+        for code, amount in self.portfolio.items():
+            currency = next((c for c in currencies if c.code == code), None)
+            if currency:
+                self.total_value += amount * currency.rate
+        self.profit = self.total_value - self.initial_cash
+
+
+# 单个账户的风险状态（按货币下标存储的向量）
+class AccountRisk:
+    def __init__(self, n):
+        self.amounts = [0.0] * n  # 持仓数量
+        self.exposure = [0.0] * n  # 各货币敞口（USD）
+        self.sigma_w = [0.0] * n  # 协方差矩阵与敞口向量的乘积 Σw
+        self.variance = 0.0  # 组合日收益方差 w'Σw
+        self.gross = 0.0  # 总敞口
+        self.net = 0.0  # 净敞口（持仓按当前汇率计价）
+        self.historical_var = 0.0
+        self.historical_stale = False  # 成交后历史VaR需要重算
+        self.parametric_var = 0.0
+
+
+# 风险引擎类：所有账户共享同一份收益率统计，每日收盘更新协方差，日内按批重新计价，下单时增量检查
+class RiskEngine:
+    def __init__(self, currencies, window=100, confidence=0.95, max_leverage=1.0, max_var_ratio=0.25):
+        self.codes = [c.code for c in currencies]
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        self.window = window
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf(confidence)
+        self.max_leverage = max_leverage
+        self.max_var_ratio = max_var_ratio  # VaR 占账户净值的上限
+        self.accounts = {}
+
+        n = len(self.codes)
+        self.rates = [c.rate for c in currencies]
+        self.returns = deque()  # 滚动窗口内的日收益率向量
+        # 滚动窗口内的一阶和与交叉乘积和，用于增量计算协方差
+        self.sums = [0.0] * n
+        self.cross = [[0.0] * n for _ in range(n)]
+        self.cov = [[0.0] * n for _ in range(n)]
+
+    def register(self, player):
+        self.accounts[player] = AccountRisk(len(self.codes))
+
+    def on_close(self, currencies):
+        """每日收盘：更新收益率窗口和协方差矩阵，并重新计价所有账户"""
+        n = len(self.codes)
+        new_rates = [c.rate for c in currencies]
+        row = [new_rates[i] / self.rates[i] - 1 for i in range(n)]
+        self.rates = new_rates
+
+        self._accumulate(row, 1)
+        self.returns.append(row)
+        if len(self.returns) > self.window:
+            self._accumulate(self.returns.popleft(), -1)
+
+        count = len(self.returns)
+        if count > 1:
+            for i in range(n):
+                for j in range(i, n):
+                    c = (self.cross[i][j] - self.sums[i] * self.sums[j] / count) / (count - 1)
+                    self.cov[i][j] = self.cov[j][i] = c
+
+        self.mark(currencies)
+
+    def mark(self, currencies):
+        """按当前汇率重新计价所有账户的敞口、Σw和参数VaR，日内每批tick调用一次"""
+        rates = [c.rate for c in currencies]
+        for state in self.accounts.values():
+            state.exposure = [a * r for a, r in zip(state.amounts, rates)]
+            state.gross = sum(abs(e) for e in state.exposure)
+            state.net = sum(state.exposure)
+            self._refresh_variance(state)
+            state.parametric_var = self.z * math.sqrt(max(state.variance, 0.0))
+            state.historical_stale = True
+
+    def _accumulate(self, row, sign):
+        n = len(row)
+        for i in range(n):
+            self.sums[i] += sign * row[i]
+            cross_i = self.cross[i]
+            for j in range(i, n):
+                cross_i[j] += sign * row[i] * row[j]
+
+    def _refresh_variance(self, state):
+        state.sigma_w = [sum(c * e for c, e in zip(cov_row, state.exposure)) for cov_row in self.cov]
+        state.variance = sum(w * sw for w, sw in zip(state.exposure, state.sigma_w))
+
+    def _refresh_var(self, state):
+        state.parametric_var = self.z * math.sqrt(max(state.variance, 0.0))
+        state.historical_stale = False
+        if len(self.returns) < 2:
+            state.historical_var = 0.0
+            return
+        pnl = sorted(sum(e * r for e, r in zip(state.exposure, row)) for row in self.returns)
+        k = int((1 - self.confidence) * len(pnl))
+        # 空仓时 -pnl[k] 为 -0.0，max(-0.0, 0.0) 会返回 -0.0，因此把 0.0 放在前面
+        state.historical_var = max(0.0, -pnl[k])
+
+    def check_order(self, player, code, amount, rate):
+        """下单前检查杠杆/保证金与VaR限额，只用缓存的向量做O(1)计算"""
+        state = self.accounts[player]
+        i = self.index[code]
+        delta = amount * rate
+        # 下单后总敞口不能超过 净值 * 杠杆上限，杠杆为1时即原来的现金检查
+        equity = player.cash + state.net
+        if state.gross + delta > equity * self.max_leverage:
+            return False, "资金不足"
+
+        if len(self.returns) > 1:
+            variance = state.variance + 2 * delta * state.sigma_w[i] + delta * delta * self.cov[i][i]
+            if self.z * math.sqrt(max(variance, 0.0)) > self.max_var_ratio * equity:
+                return False, "超出风险限额"
+        return True, ""
+
+    def on_fill(self, player, code, rate):
+        """成交后按新的持仓量增量更新账户敞口和组合方差"""
+        state = self.accounts[player]
+        i = self.index[code]
+        amount = player.portfolio.get(code, 0.0)
+        old = state.exposure[i]
+        new = amount * rate
+        delta = new - old
+        state.amounts[i] = amount
+        state.exposure[i] = new
+        state.gross += abs(new) - abs(old)
+        state.net += delta
+
+        state.variance += 2 * delta * state.sigma_w[i] + delta * delta * self.cov[i][i]
+        for j, cov_row in enumerate(self.cov):
+            state.sigma_w[j] += cov_row[i] * delta
+        state.parametric_var = self.z * math.sqrt(max(state.variance, 0.0))
+        # 历史VaR需要遍历整个收益率窗口，延迟到读取时再算
+        state.historical_stale = True
+
+    def historical_var(self, player):
+        state = self.accounts[player]
+        if state.historical_stale:
+            self._refresh_var(state)
+        return state.historical_var
+
+    def leverage(self, player):
+        state = self.accounts[player]
+        equity = player.cash + state.net
+        return state.gross / equity if equity > 0 else float("inf")
+
+
+# 数据导出类：把每个汇率tick、市场事件和成交记录按列追加写入二进制文件
+class TickExporter:
+    # 每个数据流的列定义 {stream: [(column, typecode), ...]}
+    # (day, tick) 表示当天已走过的tick数：tick=0 为开盘，成交和事件可按 (day, tick) 与汇率行对齐
+    STREAMS = {
+        "ticks": [("day", "l"), ("tick", "l"), ("currency", "b"), ("rate", "d")],
+        "events": [("day", "l"), ("tick", "l"), ("event", "b")],
+        "fills": [("day", "l"), ("tick", "l"), ("currency", "b"), ("side", "b"), ("amount", "d"), ("rate", "d")],
+    }
+
+    def __init__(self, directory, currency_codes, event_names, batch_size=4096, max_pending=8):
+        self.batch_size = batch_size
+        self.currency_index = {code: i for i, code in enumerate(currency_codes)}
+        self.event_index = {name: i for i, name in enumerate(event_names)}
+        self.buffers = {name: self._new_batch(name) for name in self.STREAMS}
+        # 有界队列：写入线程跟不上时阻塞生产者，避免内存无限增长
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.closed = False
+        self.error = None  # 写入线程遇到的异常
+        self.writer = None
+        self.committed = {name: 0 for name in self.STREAMS}  # 各数据流已完整写入的行数
+
+        if not directory:
+            self.closed = True  # 未配置导出目录时不导出
+            return
+
+        # 每次运行写入独立的子目录，避免追加到上一次运行的数据后面
+        self.directory = os.path.join(directory, time.strftime("run-%Y%m%d-%H%M%S") + f"-{os.getpid()}")
+        schema = {
+            "streams": {name: [{"name": col, "typecode": tc, "itemsize": array(tc).itemsize}
+                               for col, tc in cols]
+                        for name, cols in self.STREAMS.items()},
+            "currencies": list(currency_codes),
+            "events": list(event_names),
+            "sides": ["buy", "sell"],
+        }
+        try:
+            os.makedirs(self.directory)
+            with open(os.path.join(self.directory, "schema.json"), "w", encoding="utf-8") as f:
+                json.dump(schema, f, ensure_ascii=False, indent=2)
+            # 预先创建所有列文件，没有数据的数据流也能按 schema.json 读取
+            for name, cols in self.STREAMS.items():
+                for col, _ in cols:
+                    open(self._path(name, col), "wb").close()
+        except OSError as e:
+            # 导出失败不影响游戏本身
+            self.error = e
+            self.closed = True
+            print(f"无法创建导出目录，已关闭数据导出: {e}", file=sys.stderr)
+            return
+
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _path(self, stream, col):
+        return os.path.join(self.directory, f"{stream}.{col}.bin")
+
+    def _new_batch(self, stream):
+        return [array(tc) for _, tc in self.STREAMS[stream]]
+
+    def _append(self, stream, values):
+        columns = self.buffers[stream]
+        for column, value in zip(columns, values):
+            column.append(value)
+        if len(columns[0]) >= self.batch_size:
+            self._flush_stream(stream)
+
+    def _flush_stream(self, stream):
+        columns = self.buffers[stream]
+        if len(columns[0]) == 0:
+            return
+        self.buffers[stream] = self._new_batch(stream)
+        if self.error:
+            # 写入线程已出错：停止导出并丢弃数据，不能阻塞游戏循环
+            self.closed = True
+            return
+        self.pending.put((stream, columns))
+
+    def _write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            if self.error:
+                continue  # 出错后只清空队列，保证生产者不会阻塞
+            stream, columns = item
+            try:
+                for (col, _), column in zip(self.STREAMS[stream], columns):
+                    with open(self._path(stream, col), "ab") as f:
+                        column.tofile(f)
+                self.committed[stream] += len(columns[0])
+            except Exception as e:
+                self.error = e
+                self._rollback(stream)
+                print(f"数据导出失败，已停止导出: {e}", file=sys.stderr)
+
+    def _rollback(self, stream):
+        """批次写到一半失败时，把各列截断回最后一个完整批次，保证各列行数一致"""
+        rows = self.committed[stream]
+        for col, tc in self.STREAMS[stream]:
+            try:
+                os.truncate(self._path(stream, col), rows * array(tc).itemsize)
+            except OSError:
+                pass
+
+    def record_ticks(self, day, tick, currencies):
+        if self.closed:
+            return
+        for currency in currencies:
+            self._append("ticks", (day, tick, self.currency_index[currency.code], currency.rate))
+
+    def record_event(self, day, tick, event_name):
+        if self.closed:
+            return
+        self._append("events", (day, tick, self.event_index[event_name]))
+
+    def record_fill(self, day, tick, currency, side, amount, rate):
+        if self.closed:
+            return
+        self._append("fills", (day, tick, self.currency_index[currency.code],
+                               0 if side == "buy" else 1, amount, rate))
+
+    def flush(self):
+        for stream in self.STREAMS:
+            self._flush_stream(stream)
+
+    def close(self):
+        if self.writer is None:
+            return
+        if not self.closed:
+            self.flush()
+        self.closed = True
+        self.pending.put(None)
+        self.writer.join()
+        self.writer = None
+
+
+# 市场事件
+MARKET_EVENTS = [
+    "美联储宣布加息25个基点",
+    "欧洲央行维持利率不变",
+    "英国通胀数据超预期",
+    "日本央行干预外汇市场",
+    "大宗商品价格大幅上涨",
+    "地缘政治紧张局势升级",
+    "全球经济衰退担忧加剧",
+    "就业数据好于预期",
+    "贸易赤字扩大",
+    "消费者信心指数上升"
+]
+
+
+# 市场类：推进日内tick，收盘时触发市场事件，并驱动风险引擎和数据导出，可以无界面运行
+class Market:
+    def __init__(self, currencies, events=MARKET_EVENTS, clock=None, risk_engine=None, exporter=None, players=()):
+        self.currencies = currencies
+        self.events = events
+        self.clock = clock or SimClock()
+        self.risk_engine = risk_engine
+        self.exporter = exporter
+        self.players = list(players)
+        self.day = 1
+
+        for currency in currencies:
+            currency.set_resolution(self.clock.ticks_per_day)
+        if exporter:
+            exporter.record_ticks(self.day, 0, currencies)  # 第一天开盘
+
+    def end_day(self):
+        """收盘：记录日K线，随机触发市场事件，更新风险统计并进入下一天，返回触发的事件"""
+        event = None
+        for currency in self.currencies:
+            currency.close_day()
+        if random.random() < 0.3:
+            event = random.choice(self.events)
+            if self.exporter:
+                self.exporter.record_event(self.day, self.clock.ticks_per_day, event)
+            for currency in self.currencies:
+                if random.random() < 0.5:
+                    change = random.uniform(-0.05, 0.05)
+                    currency.rate = max(currency.min_rate, currency.rate * (1 + change))
+        if self.risk_engine:
+            self.risk_engine.on_close(self.currencies)
+        for currency in self.currencies:
+            currency.start_day()
+        self.day += 1
+        if self.exporter:
+            self.exporter.record_ticks(self.day, 0, self.currencies)  # 新一天开盘（含事件冲击后的跳空）
+        return event
+
+    def run_ticks(self, steps):
+        """推进若干个日内tick，返回期间最后触发的市场事件，没有则返回None"""
+        event = None
+        for _ in range(steps):
+            for currency in self.currencies:
+                currency.tick()
+            # 第k个tick之后的汇率记为 (day, k)，与成交时的 clock.tick 一致
+            if self.exporter:
+                self.exporter.record_ticks(self.day, self.clock.tick + 1, self.currencies)
+            if self.clock.step():
+                event = self.end_day() or event
+        if steps:
+            # 每批tick结束后重新计价，保证下单时的敞口和净值使用当前汇率
+            if self.risk_engine:
+                self.risk_engine.mark(self.currencies)
+            for player in self.players:
+                player.update_portfolio_value(self.currencies)
+        return event
+
+    def run_days(self, days):
+        """推进若干个完整的交易日"""
+        for _ in range(days):
+            self.run_ticks(self.clock.ticks_left())
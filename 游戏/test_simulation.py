@@ -0,0 +1,296 @@
+import math
+import os
+import random
+import shutil
+import statistics
+from array import array
+
+from simulation import MARKET_EVENTS, Currency, Market, Player, RiskEngine, SimClock, TickExporter
+
+
+def make_currencies():
+    return [
+        Currency("USD", "美元", 1.0, 0.005),
+        Currency("EUR", "欧元", 1.08, 0.008),
+        Currency("JPY", "日元", 0.0091, 0.015),
+    ]
+
+
+def random_closes(engine, currencies, days, rng):
+    rows = []
+    for _ in range(days):
+        previous = [c.rate for c in currencies]
+        for c in currencies:
+            c.rate *= 1 + rng.uniform(-0.02, 0.02)
+        rows.append([c.rate / p - 1 for c, p in zip(currencies, previous)])
+        engine.on_close(currencies)
+    return rows
+
+
+def test_rolling_covariance_matches_direct_computation():
+    rng = random.Random(1)
+    currencies = make_currencies()
+    engine = RiskEngine(currencies, window=10)
+    rows = random_closes(engine, currencies, 25, rng)
+
+    window = rows[-10:]
+    for i in range(len(currencies)):
+        for j in range(len(currencies)):
+            expected = statistics.covariance([r[i] for r in window], [r[j] for r in window])
+            assert math.isclose(engine.cov[i][j], expected, rel_tol=1e-6, abs_tol=1e-12)
+
+
+def test_fills_update_variance_incrementally():
+    rng = random.Random(2)
+    currencies = make_currencies()
+    engine = RiskEngine(currencies, max_var_ratio=10.0)
+    player = Player(engine)
+    random_closes(engine, currencies, 30, rng)
+
+    player.buy_currency(currencies[1], 3000, currencies[1].rate)
+    player.buy_currency(currencies[2], 200000, currencies[2].rate)
+    player.sell_currency(currencies[1], 1000, currencies[1].rate)
+    state = engine.accounts[player]
+    variance, gross, net = state.variance, state.gross, state.net
+
+    engine.mark(currencies)
+    assert math.isclose(variance, state.variance, rel_tol=1e-9)
+    assert math.isclose(gross, state.gross, rel_tol=1e-9)
+    assert math.isclose(net, state.net, rel_tol=1e-9)
+    assert engine.historical_var(player) > 0
+
+
+def test_empty_book_has_zero_var():
+    rng = random.Random(6)
+    currencies = make_currencies()
+    engine = RiskEngine(currencies)
+    player = Player(engine)
+    random_closes(engine, currencies, 5, rng)
+
+    var = engine.historical_var(player)
+    assert var == 0.0 and math.copysign(1.0, var) == 1.0
+    assert f"{var:.2f}" == "0.00"
+
+
+def test_leverage_limit_above_one():
+    currencies = make_currencies()
+    engine = RiskEngine(currencies, max_leverage=2.0)
+    player = Player(engine)
+
+    ok, _ = player.buy_currency(currencies[0], 15000, 1.0)
+    assert ok
+    ok, _ = player.buy_currency(currencies[0], 5000, 1.0)
+    assert ok
+    assert math.isclose(engine.leverage(player), 2.0)
+    ok, msg = player.buy_currency(currencies[0], 1, 1.0)
+    assert not ok and msg == "资金不足"
+
+
+def test_leverage_one_matches_cash_check():
+    currencies = make_currencies()
+    engine = RiskEngine(currencies)
+    player = Player(engine)
+
+    ok, msg = player.buy_currency(currencies[1], 10000, 1.08)
+    assert not ok and msg == "资金不足"
+    ok, _ = player.buy_currency(currencies[1], 9000, 1.08)
+    assert ok
+
+
+def test_check_order_uses_current_marks():
+    currencies = make_currencies()
+    engine = RiskEngine(currencies, max_leverage=2.0)
+    player = Player(engine)
+    player.buy_currency(currencies[1], 10000, 1.0)
+
+    # 持仓升值后净值增加到15000，总额度从20000增加到30000
+    currencies[1].rate = 1.5
+    ok, _ = engine.check_order(player, "USD", 15000, 1.0)
+    assert not ok
+    engine.mark(currencies)
+    ok, _ = engine.check_order(player, "USD", 15000, 1.0)
+    assert ok
+
+
+def test_var_limit_rejects_large_orders():
+    rng = random.Random(3)
+    currencies = make_currencies()
+    engine = RiskEngine(currencies, max_leverage=100.0, max_var_ratio=0.01)
+    player = Player(engine)
+    random_closes(engine, currencies, 30, rng)
+
+    ok, msg = engine.check_order(player, "JPY", 10000000, currencies[2].rate)
+    assert not ok and msg == "超出风险限额"
+
+
+def test_clock_accumulates_fractional_steps():
+    clock = SimClock(speeds=(0, 10))
+    assert clock.advance(1.0) == 0  # 暂停时不推进
+    clock.faster()
+    assert clock.advance(0.25) == 2
+    assert clock.advance(0.25) == 3  # 上一帧剩余的0.5个tick被累加
+    assert math.isclose(clock.accumulator, 0.0, abs_tol=1e-9)
+
+
+def test_clock_drops_backlog_beyond_frame_limit():
+    clock = SimClock(speeds=(0, 1000), max_steps_per_frame=50)
+    clock.faster()
+    assert clock.advance(1.0) == 50
+    assert clock.accumulator == 0.0
+    assert clock.advance(0.01) == 10
+
+
+def test_clock_day_rollover_and_labels():
+    clock = SimClock(ticks_per_day=96, speeds=(0, 4))
+    assert clock.speed_label() == "暂停"
+    clock.toggle_pause()
+    assert clock.speed_label() == "60分钟/秒"
+
+    ends = [clock.step() for _ in range(clock.ticks_left())]
+    assert ends.count(True) == 1 and ends[-1]
+    assert clock.tick == 0
+    for _ in range(50):
+        clock.step()
+    assert clock.time_label() == "12:30"
+
+
+def test_candle_tracks_open_high_low_close():
+    random.seed(4)
+    currency = Currency("EUR", "欧元", 1.08, 0.008)
+    currency.set_resolution(1440)
+    currency.start_day()
+    rates = [currency.rate]
+    for _ in range(1440):
+        currency.tick()
+        rates.append(currency.rate)
+
+    assert currency.current_candle() == (rates[0], max(rates), min(rates), rates[-1])
+    currency.close_day()
+    assert currency.candles[-1] == (rates[0], max(rates), min(rates), rates[-1])
+    assert currency.history[-1] == rates[-1]
+
+
+def test_single_tick_trend_day_follows_trend():
+    random.seed(5)
+    currency = Currency("EUR", "欧元", 1.08, 0.008)
+    currency.history = [1.0, 1.01, 1.02, 1.03, 1.04, 1.05]
+    for _ in range(200):
+        currency.start_day()
+        before = currency.rate
+        currency.tick()
+        assert 0 <= currency.rate / before - 1 <= 0.7 * currency.volatility + 1e-12
+
+
+def read_column(run_dir, stream, column, typecode):
+    values = array(typecode)
+    values.frombytes((run_dir / f"{stream}.{column}.bin").read_bytes())
+    return list(values)
+
+
+def test_exporter_writes_columns_to_a_run_directory(tmp_path):
+    currencies = make_currencies()
+    exporter = TickExporter(str(tmp_path), [c.code for c in currencies], ["加息", "降息"], batch_size=4)
+    for tick in range(10):
+        exporter.record_ticks(1, tick, currencies)
+    exporter.record_fill(1, 3, currencies[1], "buy", 100.0, 1.08)
+    exporter.record_fill(2, 7, currencies[2], "sell", 50.0, 0.0091)
+    exporter.record_event(1, 1440, "降息")
+    exporter.close()
+
+    (run_dir,) = tmp_path.iterdir()
+    assert (run_dir / "schema.json").exists()
+    assert len(read_column(run_dir, "ticks", "rate", "d")) == 10 * len(currencies)
+
+    assert read_column(run_dir, "fills", "day", "l") == [1, 2]
+    assert read_column(run_dir, "fills", "tick", "l") == [3, 7]
+    assert read_column(run_dir, "fills", "currency", "b") == [1, 2]
+    assert read_column(run_dir, "fills", "side", "b") == [0, 1]
+    assert read_column(run_dir, "fills", "amount", "d") == [100.0, 50.0]
+    assert read_column(run_dir, "fills", "rate", "d") == [1.08, 0.0091]
+
+    assert read_column(run_dir, "events", "day", "l") == [1]
+    assert read_column(run_dir, "events", "tick", "l") == [1440]
+    assert read_column(run_dir, "events", "event", "b") == [1]
+
+
+def test_exporter_disabled_without_directory():
+    exporter = TickExporter(None, ["USD"], [])
+    exporter.record_ticks(1, 0, make_currencies()[:1])
+    exporter.close()
+    assert exporter.closed and exporter.error is None
+
+
+def test_exporter_stops_instead_of_blocking_on_write_errors(tmp_path):
+    currencies = make_currencies()
+    exporter = TickExporter(str(tmp_path), [c.code for c in currencies], [], batch_size=1, max_pending=1)
+    shutil.rmtree(tmp_path)
+    for tick in range(100):
+        exporter.record_ticks(1, tick, currencies)
+    exporter.close()
+    assert isinstance(exporter.error, OSError)
+    assert not os.path.exists(tmp_path)
+
+
+def test_exporter_creates_every_column_file(tmp_path):
+    exporter = TickExporter(str(tmp_path), ["USD"], ["加息"])
+    exporter.close()
+
+    (run_dir,) = tmp_path.iterdir()
+    for stream, cols in TickExporter.STREAMS.items():
+        for col, _ in cols:
+            assert (run_dir / f"{stream}.{col}.bin").read_bytes() == b""
+
+
+def test_exporter_truncates_partial_batch_on_error(tmp_path):
+    currencies = make_currencies()
+    exporter = TickExporter(str(tmp_path), [c.code for c in currencies], [])
+
+    # 让中间的某一列无法写入：前面的列写入成功后整批失败
+    (run_dir,) = tmp_path.iterdir()
+    (run_dir / "fills.side.bin").unlink()
+    (run_dir / "fills.side.bin").mkdir()
+    exporter.record_ticks(1, 0, currencies)
+    exporter.record_fill(1, 0, currencies[1], "sell", 2.0, 1.08)
+    exporter.close()
+
+    assert exporter.error is not None
+    assert exporter.committed["fills"] == 0
+    for col, tc in TickExporter.STREAMS["fills"]:
+        if col != "side":
+            assert read_column(run_dir, "fills", col, tc) == []
+
+
+def test_market_runs_headless_days_with_export(tmp_path):
+    random.seed(3)  # 这个种子下三天收盘都会触发市场事件
+    currencies = make_currencies()
+    engine = RiskEngine(currencies)
+    player = Player(engine)
+    exporter = TickExporter(str(tmp_path), [c.code for c in currencies], MARKET_EVENTS, batch_size=16)
+    clock = SimClock(ticks_per_day=24)
+    market = Market(currencies, MARKET_EVENTS, clock, engine, exporter, [player])
+
+    player.buy_currency(currencies[1], 1000, currencies[1].rate)
+    exporter.record_fill(market.day, clock.tick, currencies[1], "buy", 1000, currencies[1].rate)
+    market.run_days(3)
+    market.run_ticks(5)
+    exporter.close()
+
+    assert market.day == 4 and clock.tick == 5
+    assert all(len(c.candles) == 3 and len(c.history) == 4 for c in currencies)
+    assert len(engine.returns) == 3
+    assert math.isclose(player.total_value, player.cash + 1000 * currencies[1].rate)
+
+    (run_dir,) = tmp_path.iterdir()
+    days = read_column(run_dir, "ticks", "day", "l")
+    ticks = read_column(run_dir, "ticks", "tick", "l")
+    rates = read_column(run_dir, "ticks", "rate", "d")
+    n = len(currencies)
+    # 第一天开盘 + 每天24个tick和下一天的开盘 + 第4天的5个tick
+    assert len(days) == (1 + 3 * 25 + 5) * n
+    assert days[:n] == [1] * n and ticks[:n] == [0] * n
+    assert days[-n:] == [4] * n and ticks[-n:] == [5] * n
+    assert rates[-n:] == [c.rate for c in currencies]
+
+    assert read_column(run_dir, "events", "day", "l") == [1, 2, 3]
+    assert read_column(run_dir, "events", "tick", "l") == [24, 24, 24]
+    assert read_column(run_dir, "fills", "tick", "l") == [0]
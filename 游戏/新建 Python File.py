@@ -3,6 +3,8 @@ import sys
 import random
 import os
 
+from simulation import MARKET_EVENTS, Currency, Market, Player, RiskEngine, SimClock, TickExporter
+
 # 初始化pygame
 pygame.init()
 
@@ -56,79 +58,6 @@ font_large = load_font(32)
 font_title = load_font(40)
 
 
-# 货币类
-class Currency:
-    def __init__(self, code, name, initial_rate, volatility):
-        self.code = code
-        self.name = name
-        self.rate = initial_rate  # 相对于基础货币（USD）的汇率
-        self.volatility = volatility
-        self.history = [initial_rate]
-        self.color = GRAPH_COLORS[len(self.history) % len(GRAPH_COLORS)]
-
-    def update_rate(self):
-        # 随机波动，但有一定趋势性
-        change = random.uniform(-self.volatility, self.volatility)
-
-        # 增加趋势性：如果最近趋势向上，更可能继续向上，反之亦然
-        if len(self.history) > 5:
-            last_trend = self.history[-1] - self.history[-6]
-            if last_trend > 0:
-                change = abs(change) * 0.7
-            else:
-                change = -abs(change) * 0.7
-
-        self.rate = max(0.1, self.rate * (1 + change))
-        self.history.append(self.rate)
-        if len(self.history) > 100:
-            self.history.pop(0)
-
-
-# 玩家类
-class Player:
-    def __init__(self):
-        self.cash = 10000.0  # 初始资金（USD）
-        self.portfolio = {}  # 持有的货币 {currency_code: amount}
-        self.total_value = self.cash
-        self.profit = 0.0
-        self.transactions = []
-
-    def buy_currency(self, currency, amount, rate):
-        cost = amount * rate
-        if cost > self.cash:
-            return False, "资金不足"
-
-        self.cash -= cost
-        if currency.code in self.portfolio:
-            self.portfolio[currency.code] += amount
-        else:
-            self.portfolio[currency.code] = amount
-
-        self.transactions.append(f"买入 {amount:.2f} {currency.code} @ {rate:.4f}")
-        return True, f"成功买入 {amount:.2f} {currency.code}"
-
-    def sell_currency(self, currency, amount, rate):
-        if currency.code not in self.portfolio or self.portfolio[currency.code] < amount:
-            return False, "持有量不足"
-
-        self.cash += amount * rate
-        self.portfolio[currency.code] -= amount
-
-        if self.portfolio[currency.code] < 0.01:  # 清理接近0的持仓
-            del self.portfolio[currency.code]
-
-        self.transactions.append(f"卖出 {amount:.2f} {currency.code} @ {rate:.4f}")
-        return True, f"成功卖出 {amount:.2f} {currency.code}"
-
-    def update_portfolio_value(self, currencies):
-        self.total_value = self.cash
-        for code, amount in self.portfolio.items():
-            currency = next((c for c in currencies if c.code == code), None)
-            if currency:
-                self.total_value += amount * currency.rate
-        self.profit = self.total_value - 10000.0
-
-
 # 按钮类
 class Button:
     def __init__(self, x, y, width, height, text, action=None):
@@ -166,8 +95,9 @@ currencies = [
     Currency("CAD", "加元", 0.74, 0.009)
 ]
 
-# 创建玩家
-player = Player()
+# 创建风险引擎和玩家
+risk_engine = RiskEngine(currencies)
+player = Player(risk_engine)
 
 
 # 创建按钮
@@ -293,20 +223,14 @@ class TradePanel:
 
         return confirm_btn, cancel_btn, input_rect
 
-    def update(self):
-        """更新光标闪烁状态"""
-        self.cursor_timer += 1
-        if self.cursor_timer >= 30:  # 每半秒切换一次
+    def update(self, dt):
+        """更新光标闪烁状态，dt为真实时间（秒）"""
+        self.cursor_timer += dt
+        if self.cursor_timer >= 0.5:  # 每半秒切换一次
             self.cursor_visible = not self.cursor_visible
             self.cursor_timer = 0
 
     def handle_input(self, event):
-        # 光标闪烁逻辑
-        self.cursor_timer += 1
-        if self.cursor_timer >= 30:  # 每半秒切换一次
-            self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
-
         if event.type == pygame.KEYDOWN and self.input_active:
             if event.key == pygame.K_BACKSPACE:
                 self.amount_str = self.amount_str[:-1]
@@ -393,6 +317,44 @@ def draw_line_chart(surface, x, y, width, height, data, colors, labels=None):
             surface.blit(label_surf, (x + width - 140, legend_y))
 
 
+# 绘制K线图
+def draw_candle_chart(surface, x, y, width, height, candles, label=None):
+    if not candles:
+        return
+
+    max_value = max(c[1] for c in candles)
+    min_value = min(c[2] for c in candles)
+    range_val = max_value - min_value
+    if range_val == 0:
+        range_val = 1
+
+    # 绘制背景
+    pygame.draw.rect(surface, (20, 35, 60), (x, y, width, height), border_radius=8)
+    pygame.draw.rect(surface, HIGHLIGHT, (x, y, width, height), 1, border_radius=8)
+
+    # 绘制坐标轴
+    pygame.draw.line(surface, TEXT_COLOR, (x + 40, y + height - 30), (x + width - 10, y + height - 30), 2)
+    pygame.draw.line(surface, TEXT_COLOR, (x + 40, y + 10), (x + 40, y + height - 30), 2)
+
+    def to_y(val):
+        return y + height - 30 - ((val - min_value) / range_val * (height - 40))
+
+    slot = (width - 50) / len(candles)
+    body_width = max(1, int(slot * 0.6))
+    for i, (open_, high, low, close) in enumerate(candles):
+        color = PROFIT_COLOR if close >= open_ else LOSS_COLOR
+        center = x + 40 + slot * (i + 0.5)
+        pygame.draw.line(surface, color, (center, to_y(high)), (center, to_y(low)), 1)
+        top = to_y(max(open_, close))
+        body_height = max(1, to_y(min(open_, close)) - top)
+        pygame.draw.rect(surface, color, (center - body_width // 2, top, body_width, body_height))
+
+    # 绘制图例
+    if label:
+        label_surf = font_small.render(label, True, TEXT_COLOR)
+        surface.blit(label_surf, (x + width - 140, y + 10))
+
+
 # 显示开始界面
 def show_start_screen():
     screen.fill(BACKGROUND)
@@ -456,253 +418,276 @@ def show_start_screen():
 
 # 主游戏循环
 clock = pygame.time.Clock()
-current_day = 1
 selected_currency = None
-market_events = [
-    "美联储宣布加息25个基点",
-    "欧洲央行维持利率不变",
-    "英国通胀数据超预期",
-    "日本央行干预外汇市场",
-    "大宗商品价格大幅上涨",
-    "地缘政治紧张局势升级",
-    "全球经济衰退担忧加剧",
-    "就业数据好于预期",
-    "贸易赤字扩大",
-    "消费者信心指数上升"
-]
 event_message = ""
 event_timer = 0
 
+# 创建数据导出器（仅在设置了环境变量 FX_EXPORT_DIR 时导出，每次运行写入其下的独立子目录）
+exporter = TickExporter(os.environ.get("FX_EXPORT_DIR"),
+                        [c.code for c in currencies], MARKET_EVENTS)
+
+# 创建模拟时钟（默认每天1440个分钟tick，初始暂停，按+/-调整速度）和市场
+sim_clock = SimClock()
+market = Market(currencies, MARKET_EVENTS, sim_clock, risk_engine, exporter, [player])
+
+
+def run_ticks(steps):
+    """推进市场，并显示期间新触发的市场事件"""
+    global event_message, event_timer
+    event = market.run_ticks(steps)
+    if event:
+        event_message = event
+        event_timer = 3.0
+
+
 # 显示开始界面
 try:
     show_start_screen()
 except KeyboardInterrupt:
+    exporter.close()
     pygame.quit()
     sys.exit()
 
 running = True
-while running:
-    mouse_pos = pygame.mouse.get_pos()
+try:
+    while running:
+        mouse_pos = pygame.mouse.get_pos()
+        dt = clock.get_time() / 1000  # 上一帧耗时（秒）
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+            if trade_panel.active:
+                confirm_btn, cancel_btn, input_rect = trade_panel.draw(screen)
+                confirm_btn.check_hover(mouse_pos)
+                cancel_btn.check_hover(mouse_pos)
+
+                if event.type == pygame.MOUSEBUTTONDOWN:
+                    if input_rect.collidepoint(mouse_pos):
+                        trade_panel.input_active = True
+                        if trade_panel.amount_str == "100.0":
+                            trade_panel.amount_str = ""
+                    else:
+                        trade_panel.input_active = False
+
+                    if cancel_btn.rect.collidepoint(mouse_pos):
+                        trade_panel.close()
+                    elif confirm_btn.rect.collidepoint(mouse_pos):
+                        try:
+                            amount = float(trade_panel.amount_str)
+                            if trade_panel.mode == "buy":
+                                success, msg = player.buy_currency(
+                                    trade_panel.selected_currency,
+                                    amount,
+                                    trade_panel.selected_currency.rate
+                                )
+                            else:
+                                success, msg = player.sell_currency(
+                                    trade_panel.selected_currency,
+                                    amount,
+                                    trade_panel.selected_currency.rate
+                                )
+                            trade_panel.message = msg
+                            if success:
+                                exporter.record_fill(market.day, sim_clock.tick, trade_panel.selected_currency,
+                                                     trade_panel.mode, amount,
+                                                     trade_panel.selected_currency.rate)
+                                trade_panel.message_timer = 3.0
+                        except ValueError:
+                            trade_panel.message = "无效金额"
+                            trade_panel.message_timer = 3.0
+
+                trade_panel.handle_input(event)
+            else:
+                # 这里是 trade_panel 不活跃的逻辑（保留原样）
+                # 不要在这里访问 confirm_btn 或 cancel_btn
+                for button in buttons:
+                    action = button.handle_event(event)
+                    if action == "buy" and selected_currency:
+                        trade_panel.open("buy", selected_currency)
+                    elif action == "sell" and selected_currency:
+                        trade_panel.open("sell", selected_currency)
+                    elif action == "next_day":
+                        # 直接推进到当天收盘
+                        run_ticks(sim_clock.ticks_left())
+
+                if event.type == pygame.KEYDOWN:
+                    if event.key in (pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                        sim_clock.faster()
+                    elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                        sim_clock.slower()
+                    elif event.key == pygame.K_SPACE:
+                        sim_clock.toggle_pause()
+
+                if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                    for i, currency in enumerate(currencies):
+                        currency_rect = pygame.Rect(30, 190 + i * 80, 300, 70)
+                        if currency_rect.collidepoint(mouse_pos):
+                            selected_currency = currency
+
+
+        # 更新
+        run_ticks(sim_clock.advance(dt))
 
         if trade_panel.active:
-            confirm_btn, cancel_btn, input_rect = trade_panel.draw(screen)
-            confirm_btn.check_hover(mouse_pos)
-            cancel_btn.check_hover(mouse_pos)
-
-            if event.type == pygame.MOUSEBUTTONDOWN:
-                if input_rect.collidepoint(mouse_pos):
-                    trade_panel.input_active = True
-                    if trade_panel.amount_str == "100.0":
-                        trade_panel.amount_str = ""
-                else:
-                    trade_panel.input_active = False
-
-                if cancel_btn.rect.collidepoint(mouse_pos):
+            trade_panel.update(dt)
+            if trade_panel.message_timer > 0:
+                trade_panel.message_timer -= dt
+                if trade_panel.message_timer <= 0:
                     trade_panel.close()
-                elif confirm_btn.rect.collidepoint(mouse_pos):
-                    try:
-                        amount = float(trade_panel.amount_str)
-                        if trade_panel.mode == "buy":
-                            success, msg = player.buy_currency(
-                                trade_panel.selected_currency,
-                                amount,
-                                trade_panel.selected_currency.rate
-                            )
-                        else:
-                            success, msg = player.sell_currency(
-                                trade_panel.selected_currency,
-                                amount,
-                                trade_panel.selected_currency.rate
-                            )
-                        trade_panel.message = msg
-                        if success:
-                            trade_panel.message_timer = 180
-                    except ValueError:
-                        trade_panel.message = "无效金额"
-                        trade_panel.message_timer = 180
-
-            trade_panel.handle_input(event)
-        else:
-            # 这里是 trade_panel 不活跃的逻辑（保留原样）
-            # 不要在这里访问 confirm_btn 或 cancel_btn
-            for button in buttons:
-                action = button.handle_event(event)
-                if action == "buy" and selected_currency:
-                    trade_panel.open("buy", selected_currency)
-                elif action == "sell" and selected_currency:
-                    trade_panel.open("sell", selected_currency)
-                elif action == "next_day":
-                    for currency in currencies:
-                        currency.update_rate()
-                    player.update_portfolio_value(currencies)
-                    if random.random() < 0.3:
-                        event_message = random.choice(market_events)
-                        event_timer = 180
-                        for currency in currencies:
-                            if random.random() < 0.5:
-                                change = random.uniform(-0.05, 0.05)
-                                currency.rate = max(0.1, currency.rate * (1 + change))
-                    current_day += 1
-
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                for i, currency in enumerate(currencies):
-                    currency_rect = pygame.Rect(30, 190 + i * 80, 300, 70)
-                    if currency_rect.collidepoint(mouse_pos):
-                        selected_currency = currency
-
-
-    # 更新
-    if trade_panel.active and trade_panel.message_timer > 0:
-        trade_panel.message_timer -= 1
-        if trade_panel.message_timer == 0:
-            trade_panel.close()
-
-    if event_timer > 0:
-        event_timer -= 1
-
-    # 绘制界面
-    screen.fill(BACKGROUND)
 
-    # 绘制标题
-    title = font_title.render("外汇交易模拟器", True, HIGHLIGHT)
-    screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 20))
+        if event_timer > 0:
+            event_timer -= dt
+
+        # 绘制界面
+        screen.fill(BACKGROUND)
 
-    # 绘制日期和玩家信息
-    day_text = font_medium.render(f"第 {current_day} 天", True, TEXT_COLOR)
-    cash_text = font_medium.render(f"现金: ${player.cash:.2f}", True, TEXT_COLOR)
-    value_text = font_medium.render(f"总资产: ${player.total_value:.2f}", True, TEXT_COLOR)
+        # 绘制标题
+        title = font_title.render("外汇交易模拟器", True, HIGHLIGHT)
+        screen.blit(title, (WIDTH // 2 - title.get_width() // 2, 20))
 
-    profit_color = PROFIT_COLOR if player.profit >= 0 else LOSS_COLOR
-    profit_text = font_medium.render(f"收益: ${player.profit:.2f} ({player.profit / 100:.2f}%)", True, profit_color)
+        # 绘制日期和玩家信息
+        day_text = font_medium.render(f"第 {market.day} 天 {sim_clock.time_label()}", True, TEXT_COLOR)
+        cash_text = font_medium.render(f"现金: ${player.cash:.2f}", True, TEXT_COLOR)
+        value_text = font_medium.render(f"总资产: ${player.total_value:.2f}", True, TEXT_COLOR)
 
-    screen.blit(day_text, (30, 80))
-    screen.blit(cash_text, (200, 80))
-    screen.blit(value_text, (400, 80))
-    screen.blit(profit_text, (630, 80))
+        profit_color = PROFIT_COLOR if player.profit >= 0 else LOSS_COLOR
+        profit_pct = player.profit / player.initial_cash * 100
+        profit_text = font_medium.render(f"收益: ${player.profit:.2f} ({profit_pct:.2f}%)", True, profit_color)
 
-    # 绘制货币列表
-    pygame.draw.rect(screen, PANEL_BG, (20, 140, 320, 420), border_radius=12)
-    pygame.draw.rect(screen, HIGHLIGHT, (20, 140, 320, 420), 2, border_radius=12)
+        screen.blit(day_text, (30, 80))
+        screen.blit(cash_text, (200, 80))
+        screen.blit(value_text, (400, 80))
+        screen.blit(profit_text, (630, 80))
 
-    list_title = font_large.render("货币市场", True, HIGHLIGHT)
-    screen.blit(list_title, (30, 150))
+        # 绘制货币列表
+        pygame.draw.rect(screen, PANEL_BG, (20, 140, 320, 420), border_radius=12)
+        pygame.draw.rect(screen, HIGHLIGHT, (20, 140, 320, 420), 2, border_radius=12)
 
-    for i, currency in enumerate(currencies):
-        currency_rect = pygame.Rect(30, 190 + i * 80, 300, 70)
+        list_title = font_large.render("货币市场", True, HIGHLIGHT)
+        screen.blit(list_title, (30, 150))
 
-        # 高亮选中的货币
-        if currency == selected_currency:
-            pygame.draw.rect(screen, (40, 70, 120), currency_rect, border_radius=8)
-            pygame.draw.rect(screen, HIGHLIGHT, currency_rect, 2, border_radius=8)
+        for i, currency in enumerate(currencies):
+            currency_rect = pygame.Rect(30, 190 + i * 80, 300, 70)
+
+            # 高亮选中的货币
+            if currency == selected_currency:
+                pygame.draw.rect(screen, (40, 70, 120), currency_rect, border_radius=8)
+                pygame.draw.rect(screen, HIGHLIGHT, currency_rect, 2, border_radius=8)
+            else:
+                pygame.draw.rect(screen, (30, 50, 90), currency_rect, border_radius=8)
+
+            # 货币信息
+            code_text = font_large.render(currency.code, True, TEXT_COLOR)
+            name_text = font_small.render(currency.name, True, TEXT_COLOR)
+            rate_text = font_medium.render(f"1 {currency.code} = ${currency.rate:.4f}", True, TEXT_COLOR)
+
+            # 相对上一收盘价的变化
+            if len(currency.history) > 1:
+                change = ((currency.rate - currency.history[-1]) / currency.history[-1]) * 100
+                change_color = PROFIT_COLOR if change >= 0 else LOSS_COLOR
+                change_text = font_small.render(f"{change:+.2f}%", True, change_color)
+                screen.blit(change_text, (currency_rect.right - 60, currency_rect.top + 10))
+
+            screen.blit(code_text, (currency_rect.x + 15, currency_rect.y + 10))
+            screen.blit(name_text, (currency_rect.x + 15, currency_rect.y + 40))
+            screen.blit(rate_text, (currency_rect.x + 120, currency_rect.y + 20))
+
+        # 绘制投资组合
+        pygame.draw.rect(screen, PANEL_BG, (20, 570, 320, 120), border_radius=12)
+        pygame.draw.rect(screen, HIGHLIGHT, (20, 570, 320, 120), 2, border_radius=12)
+
+        portfolio_title = font_large.render("投资组合", True, HIGHLIGHT)
+        screen.blit(portfolio_title, (30, 580))
+
+        var_text = font_small.render(f"VaR(95%): ${risk_engine.historical_var(player):.2f}", True, TEXT_COLOR)
+        screen.blit(var_text, (180, 590))
+
+        if player.portfolio:
+            y_pos = 620
+            for code, amount in player.portfolio.items():
+                currency = next((c for c in currencies if c.code == code), None)
+                if currency:
+                    value = amount * currency.rate
+                    port_text = font_small.render(f"{code}: {amount:.2f} (${value:.2f})", True, TEXT_COLOR)
+                    screen.blit(port_text, (40, y_pos))
+                    y_pos += 25
         else:
-            pygame.draw.rect(screen, (30, 50, 90), currency_rect, border_radius=8)
+            empty_text = font_small.render("无持仓", True, TEXT_COLOR)
+            screen.blit(empty_text, (40, 620))
 
-        # 货币信息
-        code_text = font_large.render(currency.code, True, TEXT_COLOR)
-        name_text = font_small.render(currency.name, True, TEXT_COLOR)
-        rate_text = font_medium.render(f"1 {currency.code} = ${currency.rate:.4f}", True, TEXT_COLOR)
-
-        # 24小时变化
-        if len(currency.history) > 1:
-            change = ((currency.rate - currency.history[-2]) / currency.history[-2]) * 100
-            change_color = PROFIT_COLOR if change >= 0 else LOSS_COLOR
-            change_text = font_small.render(f"{change:+.2f}%", True, change_color)
-            screen.blit(change_text, (currency_rect.right - 60, currency_rect.top + 10))
-
-        screen.blit(code_text, (currency_rect.x + 15, currency_rect.y + 10))
-        screen.blit(name_text, (currency_rect.x + 15, currency_rect.y + 40))
-        screen.blit(rate_text, (currency_rect.x + 120, currency_rect.y + 20))
-
-    # 绘制投资组合
-    pygame.draw.rect(screen, PANEL_BG, (20, 570, 320, 120), border_radius=12)
-    pygame.draw.rect(screen, HIGHLIGHT, (20, 570, 320, 120), 2, border_radius=12)
-
-    portfolio_title = font_large.render("投资组合", True, HIGHLIGHT)
-    screen.blit(portfolio_title, (30, 580))
-
-    if player.portfolio:
-        y_pos = 620
-        for code, amount in player.portfolio.items():
-            currency = next((c for c in currencies if c.code == code), None)
-            if currency:
-                value = amount * currency.rate
-                port_text = font_small.render(f"{code}: {amount:.2f} (${value:.2f})", True, TEXT_COLOR)
-                screen.blit(port_text, (40, y_pos))
-                y_pos += 25
-    else:
-        empty_text = font_small.render("无持仓", True, TEXT_COLOR)
-        screen.blit(empty_text, (40, 620))
-
-    # 绘制汇率图表
-    pygame.draw.rect(screen, PANEL_BG, (350, 140, 630, 250), border_radius=12)
-    pygame.draw.rect(screen, HIGHLIGHT, (350, 140, 630, 250), 2, border_radius=12)
-
-    chart_title = font_large.render("汇率走势", True, HIGHLIGHT)
-    screen.blit(chart_title, (360, 150))
-
-    if selected_currency:
-        # 只显示选中的货币
-        draw_line_chart(screen, 360, 180, 610, 200,
-                        [selected_currency.history[-30:]],
-                        [selected_currency.color],
-                        [f"{selected_currency.code}/USD"])
-    else:
-        # 显示前三种货币
-        draw_line_chart(screen, 360, 180, 610, 200,
-                        [c.history[-30:] for c in currencies[:3]],
-                        GRAPH_COLORS[:3],
-                        [c.code for c in currencies[:3]])
-
-    # 绘制市场事件
-    pygame.draw.rect(screen, PANEL_BG, (350, 400, 630, 120), border_radius=12)
-    pygame.draw.rect(screen, HIGHLIGHT, (350, 400, 630, 120), 2, border_radius=12)
-
-    news_title = font_large.render("市场动态", True, HIGHLIGHT)
-    screen.blit(news_title, (360, 410))
-
-    if event_message and event_timer > 0:
-        event_surf = font_medium.render(event_message, True, (255, 200, 100))
-        screen.blit(event_surf, (370, 450))
-    else:
-        default_news = "市场稳定，无重大新闻"
-        news_surf = font_medium.render(default_news, True, TEXT_COLOR)
-        screen.blit(news_surf, (370, 450))
-
-    # 绘制交易记录
-    pygame.draw.rect(screen, PANEL_BG, (350, 530, 630, 160), border_radius=12)
-    pygame.draw.rect(screen, HIGHLIGHT, (350, 530, 630, 160), 2, border_radius=12)
-
-    trans_title = font_large.render("最近交易", True, HIGHLIGHT)
-    screen.blit(trans_title, (360, 540))
-
-    if player.transactions:
-        # 显示最多3条交易记录
-        for i, trans in enumerate(player.transactions[-3:]):
-            trans_surf = font_small.render(trans, True, TEXT_COLOR)
-            screen.blit(trans_surf, (370, 580 + i * 30))
-    else:
-        no_trans = font_small.render("暂无交易记录", True, TEXT_COLOR)
-        screen.blit(no_trans, (370, 580))
-
-    # 绘制按钮
-    for button in buttons:
-        button.check_hover(mouse_pos)
-        button.draw(screen)
-
-    # 绘制交易面板（如果激活）
-    if trade_panel.active:
-        trade_panel.draw(screen)
-
-    # 绘制提示
-    hint_text = font_small.render("选择一种货币进行交易，点击'下一天'推进市场变化", True, (150, 180, 220))
-    screen.blit(hint_text, (WIDTH // 2 - hint_text.get_width() // 2, HEIGHT - 30))
+        # 绘制汇率图表
+        pygame.draw.rect(screen, PANEL_BG, (350, 140, 630, 250), border_radius=12)
+        pygame.draw.rect(screen, HIGHLIGHT, (350, 140, 630, 250), 2, border_radius=12)
 
-    pygame.display.flip()
-    clock.tick(60)
+        chart_title = font_large.render("汇率走势", True, HIGHLIGHT)
+        screen.blit(chart_title, (360, 150))
+
+        if selected_currency:
+            # 只显示选中的货币（日K线，最后一根为当日未收盘K线）
+            draw_candle_chart(screen, 360, 180, 610, 200,
+                              selected_currency.candles[-29:] + [selected_currency.current_candle()],
+                              f"{selected_currency.code}/USD")
+        else:
+            # 显示前三种货币
+            draw_line_chart(screen, 360, 180, 610, 200,
+                            [c.history[-30:] for c in currencies[:3]],
+                            GRAPH_COLORS[:3],
+                            [c.code for c in currencies[:3]])
+
+        # 绘制市场事件
+        pygame.draw.rect(screen, PANEL_BG, (350, 400, 630, 120), border_radius=12)
+        pygame.draw.rect(screen, HIGHLIGHT, (350, 400, 630, 120), 2, border_radius=12)
+
+        news_title = font_large.render("市场动态", True, HIGHLIGHT)
+        screen.blit(news_title, (360, 410))
+
+        if event_message and event_timer > 0:
+            event_surf = font_medium.render(event_message, True, (255, 200, 100))
+            screen.blit(event_surf, (370, 450))
+        else:
+            default_news = "市场稳定，无重大新闻"
+            news_surf = font_medium.render(default_news, True, TEXT_COLOR)
+            screen.blit(news_surf, (370, 450))
+
+        # 绘制交易记录
+        pygame.draw.rect(screen, PANEL_BG, (350, 530, 630, 160), border_radius=12)
+        pygame.draw.rect(screen, HIGHLIGHT, (350, 530, 630, 160), 2, border_radius=12)
+
+        trans_title = font_large.render("最近交易", True, HIGHLIGHT)
+        screen.blit(trans_title, (360, 540))
+
+        speed_text = font_small.render(f"速度: {sim_clock.speed_label()}", True, TEXT_COLOR)
+        screen.blit(speed_text, (WIDTH - 220, HEIGHT - 165))
+
+        if player.transactions:
+            # 显示最多3条交易记录
+            for i, trans in enumerate(player.transactions[-3:]):
+                trans_surf = font_small.render(trans, True, TEXT_COLOR)
+                screen.blit(trans_surf, (370, 580 + i * 30))
+        else:
+            no_trans = font_small.render("暂无交易记录", True, TEXT_COLOR)
+            screen.blit(no_trans, (370, 580))
+
+        # 绘制按钮
+        for button in buttons:
+            button.check_hover(mouse_pos)
+            button.draw(screen)
+
+        # 绘制交易面板（如果激活）
+        if trade_panel.active:
+            trade_panel.draw(screen)
+
+        # 绘制提示
+        hint_text = font_small.render("选择一种货币进行交易，点击'下一天'推进市场变化，+/-调整速度，空格暂停", True, (150, 180, 220))
+        screen.blit(hint_text, (WIDTH // 2 - hint_text.get_width() // 2, HEIGHT - 30))
+
+        pygame.display.flip()
+        clock.tick(60)
+finally:
+    # 异常退出时也要写出缓冲中的数据
+    exporter.close()
 
 pygame.quit()
 sys.exit()